@@ -0,0 +1,25 @@
+"""
+Build script.
+
+Everything is configured in pyproject.toml; this only adds an opt-in
+compiled build. Set AGENT_MESSENGER_COMPILE=1 when installing to compile
+the protocol module (the per-packet encode/decode path) to a C extension
+with mypyc. Without it the package is pure Python.
+
+mypy must be importable by the build, e.g.:
+
+    pip install mypy
+    AGENT_MESSENGER_COMPILE=1 pip install --no-build-isolation .
+"""
+
+import os
+
+from setuptools import setup
+
+ext_modules = []
+if os.environ.get("AGENT_MESSENGER_COMPILE") == "1":
+    from mypyc.build import mypycify
+
+    ext_modules = mypycify(["src/agent_messenger/protocol.py"])
+
+setup(ext_modules=ext_modules)
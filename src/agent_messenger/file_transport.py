@@ -1,34 +1,79 @@
 """File-based IPC transport for Docker/cross-network communication."""
 
-import json
 import os
+import struct
 import time
-import glob
 import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Callable, Optional, Dict, List
+from typing import Callable, Optional, Dict, List, Tuple
 
-from .protocol import Message, MessageType, encode, decode
+from .protocol import Message, MessageType, encode, decode, current_time
+
+try:
+    import watchfiles
+except ImportError:  # pragma: no cover - optional dependency
+    watchfiles = None  # type: ignore[assignment]
 
 # File transport settings
-FILE_POLL_INTERVAL = 0.5  # seconds between polls
+FILE_POLL_INTERVAL = 0.5  # seconds between polls (without watchfiles)
+WATCH_RESCAN_INTERVAL = FILE_POLL_INTERVAL  # seconds between safety-net rescans (with watchfiles)
 MESSAGE_TTL = 60.0  # seconds before messages are cleaned up
 CLEANUP_INTERVAL = 30.0  # seconds between cleanup runs
+READ_WORKERS = 4  # threads reading and dispatching message logs
+MAX_PENDING_READS = 64  # log reads queued before the poll thread waits
+FILE_SUFFIX = ".msgpack"  # suffix of encoded heartbeat files
+LOG_SUFFIX = ".log"  # suffix of append-only message logs
+READ_SIZE = 65536  # bytes requested per read(); most files fit in one
+
+# Each log entry is a little-endian uint32 length followed by an encoded message
+_FRAME_HEADER = struct.Struct("<I")
+
+
+def _read_file(path) -> bytes:
+    """
+    Read a whole file with as few syscalls as possible.
+
+    Unlike Path.read_bytes() this skips the buffered-I/O setup (fstat,
+    isatty) and the final read() that detects EOF when a single read
+    already returned less than requested: open + read + close.
+    """
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        data = os.read(fd, READ_SIZE)
+        if len(data) < READ_SIZE:
+            return data
+        chunks = [data]
+        while data:
+            data = os.read(fd, READ_SIZE)
+            chunks.append(data)
+        return b"".join(chunks)
+    finally:
+        os.close(fd)
 
 
 class FileTransport:
     """
     File-based message transport for environments where multicast doesn't work.
 
-    Messages are written as JSON files to a shared directory. Each agent
-    polls the directory for new messages from other agents.
+    Each agent appends its messages to its own log file in a shared
+    directory, as length-prefixed frames. Other agents remember how far
+    they have read each log and only read the bytes appended since, using
+    filesystem notifications when ``watchfiles`` is installed (still
+    rescanning every WATCH_RESCAN_INTERVAL, since shared volumes may not
+    report other hosts' writes) and polling otherwise. The poll thread only finds logs that grew; reading them and
+    calling handlers happens on a small thread pool, one reader per sender
+    at a time so each sender's messages stay in order.
+
+    Logs are rotated by starting a new generation file; old generations are
+    deleted by their owner once older than MESSAGE_TTL.
 
     Directory structure:
         {base_dir}/
-            messages/
-                {uuid}_{timestamp}_{seq}.json  # Message files
+            log/
+                {uuid}.{generation}.log  # Message logs (append-only)
             heartbeats/
-                {uuid}.json  # Heartbeat files (overwritten)
+                {uuid}.msgpack  # Heartbeat files (overwritten)
     """
 
     def __init__(self, base_dir: str, uuid: str):
@@ -41,22 +86,37 @@ class FileTransport:
         """
         self.base_dir = Path(base_dir)
         self.uuid = uuid
-        self._seq = 0
-        self._seq_lock = threading.Lock()
-        self._seen_messages: Dict[str, float] = {}  # filename -> timestamp seen
+        self._log_lock = threading.Lock()
+        self._log_fd: Optional[int] = None  # our current log, opened on first send
+        self._log_path: Optional[Path] = None
+        self._offsets: Dict[str, int] = {}  # log filename -> bytes consumed
+        self._read_pool: Optional[ThreadPoolExecutor] = None
+        self._read_slots = threading.BoundedSemaphore(MAX_PENDING_READS)
+        self._reads_lock = threading.Lock()
+        # Senders with a read in progress -> log paths to read after it
+        self._reading: Dict[str, List[str]] = {}
         self._running = False
+        self._stop_event = threading.Event()
         self._poll_thread: Optional[threading.Thread] = None
         self._cleanup_thread: Optional[threading.Thread] = None
         self._handlers: List[Callable[[Message], None]] = []
+        # Decoded heartbeat files, keyed by filename -> ((inode, mtime), message)
+        self._hb_cache: Dict[str, Tuple[Tuple[int, int], Message]] = {}
 
         # Create directories
-        self.messages_dir = self.base_dir / "messages"
+        self.log_dir = self.base_dir / "log"
         self.heartbeats_dir = self.base_dir / "heartbeats"
-        self.messages_dir.mkdir(parents=True, exist_ok=True)
+        self.log_dir.mkdir(parents=True, exist_ok=True)
         self.heartbeats_dir.mkdir(parents=True, exist_ok=True)
 
     def add_handler(self, handler: Callable[[Message], None]) -> None:
-        """Register a message handler."""
+        """
+        Register a message handler.
+
+        Handlers are called from the transport's reader threads, possibly
+        concurrently for messages from different senders, so they must be
+        thread-safe.
+        """
         self._handlers.append(handler)
 
     def start(self) -> None:
@@ -65,10 +125,16 @@ class FileTransport:
             return
 
         self._running = True
+        self._stop_event.clear()
+
+        self._read_pool = ThreadPoolExecutor(
+            max_workers=READ_WORKERS,
+            thread_name_prefix=f"FileTransport-Read-{self.uuid[:8]}",
+        )
 
         # Start poll thread
         self._poll_thread = threading.Thread(
-            target=self._poll_loop,
+            target=self._watch_loop if watchfiles else self._poll_loop,
             daemon=True,
             name=f"FileTransport-Poll-{self.uuid[:8]}",
         )
@@ -85,6 +151,7 @@ class FileTransport:
     def stop(self) -> None:
         """Stop the file transport."""
         self._running = False
+        self._stop_event.set()
 
         if self._poll_thread:
             self._poll_thread.join(timeout=2.0)
@@ -94,28 +161,33 @@ class FileTransport:
             self._cleanup_thread.join(timeout=2.0)
             self._cleanup_thread = None
 
+        if self._read_pool:
+            self._read_pool.shutdown(wait=True, cancel_futures=True)
+            self._read_pool = None
+            self._reading.clear()
+
+        with self._log_lock:
+            self._close_log()
+
     def send(self, message: Message) -> None:
         """
-        Send a message by writing to file.
+        Send a message by appending it to our log.
 
         Args:
             message: Message to send
         """
-        with self._seq_lock:
-            self._seq += 1
-            seq = self._seq
-
-        filename = f"{message.uuid}_{int(message.timestamp * 1000)}_{seq}.json"
-        filepath = self.messages_dir / filename
+        data = encode(message)
+        frame = _FRAME_HEADER.pack(len(data)) + data
 
         try:
-            data = encode(message).decode("utf-8")
-            # Write atomically using temp file + rename
-            temp_path = filepath.with_suffix(".tmp")
-            temp_path.write_text(data)
-            temp_path.rename(filepath)
+            with self._log_lock:
+                fd = self._log_fd
+                if fd is None:
+                    fd = self._open_log()
+                # A single O_APPEND write lands the whole frame at the end
+                os.write(fd, frame)
         except Exception as e:
-            print(f"Error writing message file: {e}")
+            print(f"Error writing message log: {e}")
 
     def send_heartbeat(self, message: Message) -> None:
         """
@@ -124,13 +196,17 @@ class FileTransport:
         Args:
             message: Heartbeat message
         """
-        filepath = self.heartbeats_dir / f"{message.uuid}.json"
+        filepath = self.heartbeats_dir / f"{message.uuid}{FILE_SUFFIX}"
 
         try:
-            data = encode(message).decode("utf-8")
+            data = encode(message)
             temp_path = filepath.with_suffix(".tmp")
-            temp_path.write_text(data)
-            temp_path.rename(filepath)
+            fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+            try:
+                os.write(fd, data)
+            finally:
+                os.close(fd)
+            os.replace(temp_path, filepath)
         except Exception:
             pass  # Ignore heartbeat errors
 
@@ -142,13 +218,24 @@ class FileTransport:
             Dict mapping peer UUIDs to last-seen timestamps
         """
         peers = {}
-        now = time.time()
+        now = current_time()
+        cache = {}
 
         try:
-            for filepath in self.heartbeats_dir.glob("*.json"):
+            with os.scandir(self.heartbeats_dir) as it:
+                entries = [e for e in it if e.name.endswith(FILE_SUFFIX)]
+            for entry in entries:
                 try:
-                    data = filepath.read_text()
-                    message = decode(data.encode("utf-8"))
+                    # Heartbeats are replaced by rename, so an unchanged
+                    # inode and mtime means the cached message is current
+                    st = entry.stat(follow_symlinks=False)
+                    version = (entry.inode(), st.st_mtime_ns)
+                    cached = self._hb_cache.get(entry.name)
+                    if cached is not None and cached[0] == version:
+                        message = cached[1]
+                    else:
+                        message = decode(_read_file(entry.path))
+                    cache[entry.name] = (version, message)
                     # Only include recent heartbeats and exclude self
                     if message.uuid != self.uuid and now - message.timestamp < MESSAGE_TTL:
                         peers[message.uuid] = message.timestamp
@@ -157,6 +244,8 @@ class FileTransport:
         except Exception:
             pass
 
+        # Replace rather than update, dropping entries for removed files
+        self._hb_cache = cache
         return peers
 
     def _poll_loop(self) -> None:
@@ -167,80 +256,218 @@ class FileTransport:
             except Exception as e:
                 print(f"Error polling messages: {e}")
 
-            time.sleep(FILE_POLL_INTERVAL)
+            self._stop_event.wait(FILE_POLL_INTERVAL)
+
+    def _watch_loop(self) -> None:
+        """Background thread: process message logs as they grow."""
+        try:
+            # Pick up messages written before we started watching
+            self._poll_messages()
+            last_scan = time.monotonic()
+
+            # Filter here rather than with watch_filter: watch() doesn't
+            # yield batches that were filtered out entirely, and every batch
+            # has to come back to us for the scheduled rescan below
+            interval_ms = int(WATCH_RESCAN_INTERVAL * 1000)
+            for changes in watchfiles.watch(
+                self.log_dir,
+                watch_filter=None,
+                debounce=interval_ms,
+                stop_event=self._stop_event,
+                rust_timeout=interval_ms,
+                yield_on_timeout=True,
+            ):
+                try:
+                    paths = [path for change, path in changes if self._watch_filter(change, path)]
+                    for path in sorted(paths):
+                        self._schedule_read(path)
+                    # Rescan on a fixed schedule too, in case notifications
+                    # were missed (e.g. queue overflow or shared volumes that
+                    # don't report remote changes)
+                    if time.monotonic() - last_scan >= WATCH_RESCAN_INTERVAL:
+                        self._poll_messages()
+                        last_scan = time.monotonic()
+                except Exception as e:
+                    print(f"Error processing messages: {e}")
+        except Exception as e:
+            # E.g. inotify watch limit reached or log_dir removed
+            print(f"Error watching messages, falling back to polling: {e}")
+            self._poll_loop()
+
+    def _watch_filter(self, change, path: str) -> bool:
+        """Whether a change is to another agent's message log appearing or growing."""
+        return (
+            change != watchfiles.Change.deleted
+            and path.endswith(LOG_SUFFIX)
+            and not os.path.basename(path).startswith(f"{self.uuid}.")
+        )
 
     def _poll_messages(self) -> None:
-        """Check for new message files."""
+        """Check every message log for new messages."""
         try:
-            for filepath in sorted(self.messages_dir.glob("*.json")):
-                filename = filepath.name
+            with os.scandir(self.log_dir) as it:
+                entries = [e for e in it if e.name.endswith(LOG_SUFFIX)]
+        except Exception:
+            return
 
-                # Skip already seen messages
-                if filename in self._seen_messages:
-                    continue
+        # Sorted so a sender's older generations are read before newer ones
+        entries.sort(key=lambda e: e.name)
+        for entry in entries:
+            self._schedule_read(entry.path)
+
+        # Forget logs that have been deleted. Reader threads add offsets
+        # concurrently, so iterate over a snapshot (list() is atomic)
+        names = {entry.name for entry in entries}
+        for name in list(self._offsets):
+            if name not in names:
+                del self._offsets[name]
+
+    def _schedule_read(self, path: str) -> None:
+        """Queue a log to be read on the reader pool (inline if not started)."""
+        pool = self._read_pool
+        if pool is None:
+            self._process_log(path)
+            return
 
-                # Skip our own messages (filename starts with our uuid)
-                if filename.startswith(self.uuid):
-                    self._seen_messages[filename] = time.time()
-                    continue
+        # Logs are named {uuid}.{generation}.log
+        sender = os.path.basename(path).rsplit(".", 2)[0]
+        with self._reads_lock:
+            pending = self._reading.get(sender)
+            if pending is not None:
+                # Read after the sender's current read, preserving order
+                if path not in pending:
+                    pending.append(path)
+                return
+            self._reading[sender] = []
+
+        self._read_slots.acquire()
+        try:
+            future = pool.submit(self._read_task, sender, path)
+        except Exception:
+            self._read_slots.release()
+            with self._reads_lock:
+                self._reading.pop(sender, None)
+            raise
+        future.add_done_callback(lambda _: self._read_slots.release())
+
+    def _read_task(self, sender: str, path: str) -> None:
+        """Reader thread: read a sender's log, then any queued after it."""
+        while True:
+            try:
+                self._process_log(path)
+            except Exception as e:
+                print(f"Error processing message log: {e}")
 
-                try:
-                    data = filepath.read_text()
-                    message = decode(data.encode("utf-8"))
+            with self._reads_lock:
+                pending = self._reading.get(sender)
+                if not pending:
+                    self._reading.pop(sender, None)
+                    return
+                path = pending.pop(0)
+
+    def _process_log(self, path: str) -> None:
+        """Read and dispatch the messages appended to a log since last time."""
+        filename = os.path.basename(path)
+
+        # Skip our own log
+        if filename.startswith(f"{self.uuid}."):
+            return
+
+        offset = self._offsets.get(filename, 0)
+        try:
+            fd = os.open(path, os.O_RDONLY)
+            try:
+                size = os.fstat(fd).st_size
+                if size <= offset:
+                    return
+                data = os.pread(fd, size - offset, offset)
+            finally:
+                os.close(fd)
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            print(f"Error reading message log {filename}: {e}")
+            return
 
-                    # Mark as seen
-                    self._seen_messages[filename] = time.time()
+        # Consume complete frames; a partial one is finished next time
+        view = memoryview(data)
+        pos = 0
+        header_size = _FRAME_HEADER.size
+        while pos + header_size <= len(data):
+            (length,) = _FRAME_HEADER.unpack_from(data, pos)
+            end = pos + header_size + length
+            if end > len(data):
+                break
+            frame = view[pos + header_size:end]
+            pos = end
 
-                    # Call handlers
-                    for handler in self._handlers:
-                        try:
-                            handler(message)
-                        except Exception as e:
-                            print(f"Error in file transport handler: {e}")
+            try:
+                message = decode(frame)
+            except Exception as e:
+                print(f"Error reading message from {filename}: {e}")
+                continue
 
+            # Call handlers
+            for handler in self._handlers:
+                try:
+                    handler(message)
                 except Exception as e:
-                    # Mark as seen even on error to avoid retrying
-                    self._seen_messages[filename] = time.time()
-                    print(f"Error reading message {filename}: {e}")
+                    print(f"Error in file transport handler: {e}")
 
-        except Exception:
-            pass
+        self._offsets[filename] = offset + pos
+
+    def _open_log(self) -> int:
+        """Start a new generation of our log. Caller holds _log_lock."""
+        generation = int(time.time() * 1000)
+        self._log_path = self.log_dir / f"{self.uuid}.{generation}{LOG_SUFFIX}"
+        self._log_fd = os.open(
+            self._log_path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644
+        )
+        return self._log_fd
+
+    def _close_log(self) -> None:
+        """Close our current log, if any. Caller holds _log_lock."""
+        if self._log_fd is not None:
+            os.close(self._log_fd)
+            self._log_fd = None
+            self._log_path = None
 
     def _cleanup_loop(self) -> None:
         """Background thread: clean up old messages."""
         while self._running:
-            time.sleep(CLEANUP_INTERVAL)
+            self._stop_event.wait(CLEANUP_INTERVAL)
             if self._running:
                 self._cleanup_old_messages()
 
     def _cleanup_old_messages(self) -> None:
-        """Remove old message files and seen tracking."""
+        """Rotate our log and remove our old log generations."""
         now = time.time()
 
-        # Clean up old message files (only our own)
+        # Rotate: the next send starts a new generation
+        with self._log_lock:
+            self._close_log()
+
+        # Clean up old log generations (only our own)
+        prefix = f"{self.uuid}."
         try:
-            for filepath in self.messages_dir.glob(f"{self.uuid}_*.json"):
-                try:
-                    mtime = filepath.stat().st_mtime
-                    if now - mtime > MESSAGE_TTL:
-                        filepath.unlink()
-                except Exception:
-                    pass
+            with os.scandir(self.log_dir) as it:
+                for entry in it:
+                    if not (entry.name.startswith(prefix) and entry.name.endswith(LOG_SUFFIX)):
+                        continue
+                    try:
+                        mtime = entry.stat(follow_symlinks=False).st_mtime
+                        # Never remove a log opened by a send since rotating
+                        if entry.path != str(self._log_path) and now - mtime > MESSAGE_TTL:
+                            os.unlink(entry.path)
+                    except Exception:
+                        pass
         except Exception:
             pass
 
-        # Clean up seen messages tracking
-        old_keys = [
-            k for k, v in self._seen_messages.items()
-            if now - v > MESSAGE_TTL * 2
-        ]
-        for k in old_keys:
-            del self._seen_messages[k]
-
         # Clean up our heartbeat if we're stopping
         if not self._running:
             try:
-                (self.heartbeats_dir / f"{self.uuid}.json").unlink(missing_ok=True)
+                (self.heartbeats_dir / f"{self.uuid}{FILE_SUFFIX}").unlink(missing_ok=True)
             except Exception:
                 pass
 
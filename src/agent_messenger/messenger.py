@@ -1,23 +1,30 @@
 """Main AgentMessenger class for agent-to-agent communication."""
 
+import heapq
+import selectors
+import socket
 import threading
 import time
-from typing import Callable, Dict, Optional, List
+from typing import Callable, Dict, Optional, List, Set, Tuple
 
 from .protocol import (
     Message,
     MessageType,
-    encode,
     decode,
-    create_message,
+    encode_header,
+    encode_prefix,
+    encode_timestamp,
+    make_encoder,
     create_heartbeat,
     generate_uuid,
+    current_time,
 )
 from .network import (
     create_receiver_socket,
     create_sender_socket,
     send_multicast,
-    receive_multicast,
+    send_multicast_many,
+    BatchReceiver,
 )
 from .file_transport import FileTransport
 
@@ -26,6 +33,9 @@ from .file_transport import FileTransport
 HEARTBEAT_INTERVAL = 5.0  # seconds between heartbeats
 PEER_TIMEOUT = 15.0  # seconds before peer considered offline
 
+# Receive settings
+RECV_BATCH_SIZE = 32  # max datagrams per receive syscall (1 disables batching)
+
 
 MessageHandler = Callable[[str, str], None]  # (uuid, text) -> None
 
@@ -47,30 +57,61 @@ class AgentMessenger:
         messenger.stop()
     """
 
-    def __init__(self, uuid: Optional[str] = None, file_dir: Optional[str] = None):
+    def __init__(
+        self,
+        uuid: Optional[str] = None,
+        file_dir: Optional[str] = None,
+        loop: bool = True,
+    ):
         """
         Initialize the messenger.
 
         Args:
             uuid: Agent UUID (auto-generated if not provided)
             file_dir: Directory for file-based IPC (enables file transport mode)
+            loop: Multicast loopback, so agents on the same host hear each
+                other. Disable when this is the only agent on its host to
+                have the kernel drop our own packets.
         """
         self.uuid = uuid or generate_uuid()
         self.file_dir = file_dir
+        self.loop = loop
         self._handlers: List[MessageHandler] = []
-        self._peers: Dict[str, float] = {}  # uuid -> last_seen_timestamp
-        self._peers_lock = threading.Lock()
+        # uuid -> last_seen_timestamp, written lock-free by the receive
+        # paths (single dict operations are atomic under the GIL); entries
+        # are dropped when their peer expires
+        self._peers: Dict[str, float] = {}
+        # Peers seen while not active, for get_peers() to (re)activate
+        self._new_peers: Dict[str, None] = {}
+        # Active peers, each with one (last_seen, uuid) entry in the expiry
+        # heap; only get_peers() touches these, under _expiry_lock
+        self._active_peers: Set[str] = set()
+        self._peer_expiry: List[Tuple[float, str]] = []
+        self._expiry_lock = threading.Lock()
         self._running = False
-        self._listener_thread: Optional[threading.Thread] = None
-        self._heartbeat_thread: Optional[threading.Thread] = None
-        self._receiver_socket = None
-        self._sender_socket = None
+        self._thread: Optional[threading.Thread] = None
+        # Socket pair used by stop() to wake the run loop
+        self._wakeup_reader: Optional[socket.socket] = None
+        self._wakeup_writer: Optional[socket.socket] = None
+        self._receiver_socket: Optional[socket.socket] = None
+        self._receiver: Optional[BatchReceiver] = None
+        self._sender_socket: Optional[socket.socket] = None
         self._file_transport: Optional[FileTransport] = None
+        # Packets we sent ourselves start with these bytes
+        self._own_header = encode_header(self.uuid)
+        # Text messages only vary in payload and timestamp
+        self._encode_message = make_encoder(self.uuid, MessageType.MESSAGE)
+        # Heartbeats only differ by timestamp, so encode the rest once
+        self._hb_prefix = encode_prefix(self.uuid, MessageType.HEARTBEAT, "")
 
     def on_message(self, handler: MessageHandler) -> MessageHandler:
         """
         Register a message handler (can be used as decorator).
 
+        Handlers are called from the multicast receive thread and the file
+        transport's reader threads, possibly concurrently, so they must be
+        thread-safe.
+
         Args:
             handler: Function that takes (uuid, text) arguments
 
@@ -89,13 +130,15 @@ class AgentMessenger:
         """
         Register a message handler (non-decorator version).
 
+        Handlers must be thread-safe; see on_message().
+
         Args:
             handler: Function that takes (uuid, text) arguments
         """
         self._handlers.append(handler)
 
     def start(self) -> None:
-        """Start the messenger (listener and heartbeat threads)."""
+        """Start the messenger (background receive/heartbeat thread)."""
         if self._running:
             return
 
@@ -109,28 +152,23 @@ class AgentMessenger:
 
         # Always try multicast too (dual-mode when file_dir is set)
         try:
-            self._receiver_socket = create_receiver_socket(timeout=1.0)
-            self._sender_socket = create_sender_socket()
-
-            # Start listener thread
-            self._listener_thread = threading.Thread(
-                target=self._listen_loop,
-                daemon=True,
-                name=f"AgentMessenger-Listener-{self.uuid[:8]}",
-            )
-            self._listener_thread.start()
+            # Non-blocking: the run loop only reads once the socket is ready
+            self._receiver_socket = create_receiver_socket(timeout=0.0)
+            self._receiver = BatchReceiver(self._receiver_socket, RECV_BATCH_SIZE)
+            self._sender_socket = create_sender_socket(loop=self.loop)
         except Exception as e:
             if not self.file_dir:
                 raise  # Re-raise if no file fallback
             print(f"Multicast unavailable ({e}), using file transport only")
 
-        # Start heartbeat thread
-        self._heartbeat_thread = threading.Thread(
-            target=self._heartbeat_loop,
+        # Start the thread that receives messages and sends heartbeats
+        self._wakeup_reader, self._wakeup_writer = socket.socketpair()
+        self._thread = threading.Thread(
+            target=self._run_loop,
             daemon=True,
-            name=f"AgentMessenger-Heartbeat-{self.uuid[:8]}",
+            name=f"AgentMessenger-{self.uuid[:8]}",
         )
-        self._heartbeat_thread.start()
+        self._thread.start()
 
         # Send initial heartbeat
         self._send_heartbeat()
@@ -139,17 +177,25 @@ class AgentMessenger:
         """Stop the messenger gracefully."""
         self._running = False
 
-        if self._listener_thread:
-            self._listener_thread.join(timeout=2.0)
-            self._listener_thread = None
+        if self._wakeup_writer:
+            self._wakeup_writer.send(b"\0")
 
-        if self._heartbeat_thread:
-            self._heartbeat_thread.join(timeout=2.0)
-            self._heartbeat_thread = None
+        if self._thread:
+            self._thread.join(timeout=2.0)
+            self._thread = None
+
+        if self._wakeup_reader:
+            self._wakeup_reader.close()
+            self._wakeup_reader = None
+
+        if self._wakeup_writer:
+            self._wakeup_writer.close()
+            self._wakeup_writer = None
 
         if self._receiver_socket:
             self._receiver_socket.close()
             self._receiver_socket = None
+            self._receiver = None
 
         if self._sender_socket:
             self._sender_socket.close()
@@ -169,16 +215,44 @@ class AgentMessenger:
         if not self._sender_socket and not self._file_transport:
             raise RuntimeError("Messenger not started. Call start() first.")
 
-        message = create_message(self.uuid, text)
+        timestamp = current_time()
 
         # Send via multicast if available
         if self._sender_socket:
-            data = encode(message)
+            data = self._encode_message(text, timestamp)
             send_multicast(self._sender_socket, data)
 
         # Also send via file transport if enabled
         if self._file_transport:
-            self._file_transport.send(message)
+            self._file_transport.send(Message(self.uuid, MessageType.MESSAGE, text, timestamp))
+
+    def send_many(self, texts: List[str]) -> None:
+        """
+        Send several text messages to all peers.
+
+        Equivalent to calling send() for each text, but multicast datagrams
+        are handed to the kernel in batches.
+
+        Args:
+            texts: Message texts to send, in order
+        """
+        if not self._sender_socket and not self._file_transport:
+            raise RuntimeError("Messenger not started. Call start() first.")
+
+        messages = [Message(self.uuid, MessageType.MESSAGE, text, current_time()) for text in texts]
+
+        # Send via multicast if available
+        if self._sender_socket:
+            encode_message = self._encode_message
+            send_multicast_many(
+                self._sender_socket,
+                [encode_message(m.payload, m.timestamp) for m in messages],
+            )
+
+        # Also send via file transport if enabled
+        if self._file_transport:
+            for message in messages:
+                self._file_transport.send(message)
 
     def get_peers(self) -> Dict[str, float]:
         """
@@ -187,14 +261,12 @@ class AgentMessenger:
         Returns:
             Dict mapping peer UUIDs to last-seen timestamps
         """
-        now = time.time()
-        peers = {}
+        now = current_time()
 
         # Get multicast peers
-        with self._peers_lock:
-            for uuid, last_seen in self._peers.items():
-                if now - last_seen < PEER_TIMEOUT:
-                    peers[uuid] = last_seen
+        with self._expiry_lock:
+            self._expire_peers(now)
+            peers = {uuid: self._peers[uuid] for uuid in self._active_peers}
 
         # Merge file transport peers
         if self._file_transport:
@@ -208,42 +280,109 @@ class AgentMessenger:
 
     def get_active_peer_count(self) -> int:
         """Get the number of currently active peers."""
-        return len(self.get_peers())
+        if self._file_transport:
+            # Multicast and file peers overlap, so count the merged view
+            return len(self.get_peers())
 
-    def _listen_loop(self) -> None:
-        """Background thread: listen for incoming messages."""
-        while self._running:
+        with self._expiry_lock:
+            self._expire_peers(current_time())
+            return len(self._active_peers)
+
+    def _expire_peers(self, now: float) -> None:
+        """
+        Bring the active peer set up to date. Caller holds _expiry_lock.
+
+        Only heap entries older than PEER_TIMEOUT are looked at: a peer
+        heard from since its entry was pushed gets it pushed back with
+        its newer time, otherwise it is no longer active and its last-seen
+        time is dropped, so _peers only holds recently seen peers.
+        """
+        cutoff = now - PEER_TIMEOUT
+        heap = self._peer_expiry
+
+        while self._new_peers:
             try:
-                data, addr = receive_multicast(self._receiver_socket)
-                message = decode(data)
-                self._handle_message(message)
-            except TimeoutError:
-                # Normal timeout, continue loop
-                continue
-            except OSError:
-                # Socket closed during shutdown
-                if self._running:
-                    raise
+                uuid, _ = self._new_peers.popitem()
+            except KeyError:
                 break
-            except Exception as e:
-                # Log error but keep running
-                print(f"Error receiving message: {e}")
+            last_seen = self._peers.get(uuid)
+            # Missing if it was already seen stale and dropped below
+            if last_seen is not None and uuid not in self._active_peers:
+                self._active_peers.add(uuid)
+                heapq.heappush(heap, (last_seen, uuid))
+
+        while heap and heap[0][0] <= cutoff:
+            uuid = heap[0][1]
+            last_seen = self._peers[uuid]
+            if last_seen > cutoff:
+                heapq.heapreplace(heap, (last_seen, uuid))
                 continue
 
-    def _heartbeat_loop(self) -> None:
-        """Background thread: send periodic heartbeats."""
-        while self._running:
-            time.sleep(HEARTBEAT_INTERVAL)
-            if self._running:
-                self._send_heartbeat()
+            heapq.heappop(heap)
+            self._active_peers.discard(uuid)
+            # The receive paths write _peers before checking _active_peers,
+            # so a packet that arrived before the discard shows up here
+            last_seen = self._peers.pop(uuid)
+            if last_seen > cutoff:
+                self._peers.setdefault(uuid, last_seen)
+                self._active_peers.add(uuid)
+                heapq.heappush(heap, (last_seen, uuid))
+
+    def _run_loop(self) -> None:
+        """Background thread: receive messages and send periodic heartbeats."""
+        selector = selectors.DefaultSelector()
+        if self._receiver_socket:
+            selector.register(self._receiver_socket, selectors.EVENT_READ)
+        if self._wakeup_reader:
+            selector.register(self._wakeup_reader, selectors.EVENT_READ)
+
+        next_heartbeat = time.monotonic() + HEARTBEAT_INTERVAL
+        try:
+            while self._running:
+                timeout = next_heartbeat - time.monotonic()
+                if timeout <= 0:
+                    self._send_heartbeat()
+                    next_heartbeat = time.monotonic() + HEARTBEAT_INTERVAL
+                    continue
+
+                # Wakes for incoming packets, the next heartbeat, or stop()
+                for key, _ in selector.select(timeout):
+                    if key.fileobj is self._receiver_socket:
+                        self._receive()
+        finally:
+            selector.close()
+
+    def _receive(self) -> None:
+        """Receive and handle the packets queued on the receiver socket."""
+        if not self._receiver:
+            return
+
+        try:
+            packets = self._receiver.receive()
+        except Exception as e:
+            # Log error but keep running
+            print(f"Error receiving message: {e}")
+            return
+
+        # One clock read per batch rather than per packet
+        now = current_time()
+        header = self._own_header
+        for data, addr in packets:
+            # Skip our own looped-back packets without decoding them
+            if data[:len(header)] == header:
+                continue
+            try:
+                message = decode(data)
+                self._handle_message(message, now)
+            except Exception as e:
+                # Log error but keep processing the batch
+                print(f"Error receiving message: {e}")
 
     def _send_heartbeat(self) -> None:
         """Send a heartbeat message."""
-        heartbeat = create_heartbeat(self.uuid)
-
         # Send via multicast
         if self._sender_socket:
-            data = encode(heartbeat)
+            data = self._hb_prefix + encode_timestamp(current_time())
             try:
                 send_multicast(self._sender_socket, data)
             except Exception:
@@ -251,30 +390,40 @@ class AgentMessenger:
 
         # Send via file transport
         if self._file_transport:
-            self._file_transport.send_heartbeat(heartbeat)
-
-    def _handle_message(self, message: Message) -> None:
-        """Process an incoming message."""
-        # Update peer tracking (including ourselves for consistency)
-        with self._peers_lock:
-            if message.uuid != self.uuid:
-                self._peers[message.uuid] = message.timestamp
-
-        # Handle based on message type
-        if message.type == MessageType.MESSAGE:
-            # Skip our own messages
-            if message.uuid == self.uuid:
-                return
-            # Call registered handlers
-            for handler in self._handlers:
-                try:
-                    handler(message.uuid, message.payload)
-                except Exception as e:
-                    print(f"Error in message handler: {e}")
-
-        elif message.type == MessageType.HEARTBEAT:
-            # Heartbeats just update peer tracking (already done above)
-            pass
+            self._file_transport.send_heartbeat(create_heartbeat(self.uuid))
+
+    def _handle_message(self, message: Message, received_at: Optional[float] = None) -> None:
+        """
+        Process an incoming message.
+
+        Args:
+            message: The decoded message
+            received_at: Local receive time, used as the peer's last-seen
+                time (defaults to the sender's timestamp, for messages that
+                may have been stored before being read)
+        """
+        # Skip our own messages
+        if message.uuid == self.uuid:
+            return
+
+        # Update peer tracking
+        self._peers[message.uuid] = (
+            message.timestamp if received_at is None else received_at
+        )
+        if message.uuid not in self._active_peers:
+            self._new_peers[message.uuid] = None
+
+        # Heartbeats just update peer tracking; so does everything when
+        # nobody is listening (e.g. peer discovery only)
+        if message.type != MessageType.MESSAGE or not self._handlers:
+            return
+
+        # Call registered handlers
+        for handler in self._handlers:
+            try:
+                handler(message.uuid, message.payload)
+            except Exception as e:
+                print(f"Error in message handler: {e}")
 
     def __enter__(self) -> "AgentMessenger":
         """Context manager entry."""
@@ -1,15 +1,87 @@
 """Cross-platform UDP multicast networking."""
 
+import ctypes
+import ctypes.util
+import os
+import select
 import socket
 import struct
 import sys
-from typing import Tuple, Optional
+from errno import EAGAIN, EWOULDBLOCK
+from typing import List, Tuple, Optional
 
 # Multicast configuration
 MULTICAST_GROUP = "239.255.42.1"
 MULTICAST_PORT = 5007
 MULTICAST_TTL = 1  # Stay on local network
 BUFFER_SIZE = 65535
+MAX_BATCH = 1024  # Linux UIO_MAXIOV: most messages per sendmmsg() call
+
+
+class _IOVec(ctypes.Structure):
+    _fields_ = [
+        ("iov_base", ctypes.c_void_p),
+        ("iov_len", ctypes.c_size_t),
+    ]
+
+
+class _MsgHdr(ctypes.Structure):
+    _fields_ = [
+        ("msg_name", ctypes.c_void_p),
+        ("msg_namelen", ctypes.c_uint32),
+        ("msg_iov", ctypes.POINTER(_IOVec)),
+        ("msg_iovlen", ctypes.c_size_t),
+        ("msg_control", ctypes.c_void_p),
+        ("msg_controllen", ctypes.c_size_t),
+        ("msg_flags", ctypes.c_int),
+    ]
+
+
+class _MMsgHdr(ctypes.Structure):
+    _fields_ = [
+        ("msg_hdr", _MsgHdr),
+        ("msg_len", ctypes.c_uint),
+    ]
+
+
+class _SockAddrIn(ctypes.Structure):
+    _fields_ = [
+        ("sin_family", ctypes.c_ushort),
+        ("sin_port", ctypes.c_uint16),
+        ("sin_addr", ctypes.c_ubyte * 4),
+        ("sin_zero", ctypes.c_ubyte * 8),
+    ]
+
+
+def _load_libc_function(name: str, argtypes: list):
+    """Return a libc function on Linux, or None if unavailable."""
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        func = getattr(libc, name)
+    except (OSError, AttributeError):
+        return None
+    func.argtypes = argtypes
+    func.restype = ctypes.c_int
+    return func
+
+
+# sendmmsg(fd, msgvec, vlen, flags)
+_sendmmsg = _load_libc_function(
+    "sendmmsg", [ctypes.c_int, ctypes.c_void_p, ctypes.c_uint, ctypes.c_int]
+)
+# recvmmsg(fd, msgvec, vlen, flags, timeout)
+_recvmmsg = _load_libc_function(
+    "recvmmsg",
+    [ctypes.c_int, ctypes.c_void_p, ctypes.c_uint, ctypes.c_int, ctypes.c_void_p],
+)
+
+_MULTICAST_ADDR = _SockAddrIn(
+    socket.AF_INET,
+    socket.htons(MULTICAST_PORT),
+    (ctypes.c_ubyte * 4)(*socket.inet_aton(MULTICAST_GROUP)),
+)
 
 
 def create_receiver_socket(timeout: Optional[float] = None) -> socket.socket:
@@ -27,8 +99,11 @@ def create_receiver_socket(timeout: Optional[float] = None) -> socket.socket:
     # Allow multiple processes to bind to the same port
     sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
 
-    # macOS requires SO_REUSEPORT for multiple listeners
-    if sys.platform == "darwin":
+    # macOS requires SO_REUSEPORT for multiple listeners; elsewhere it lets
+    # us share the port with programs that only set SO_REUSEPORT. Every
+    # socket in the group still receives its own copy of each multicast
+    # datagram (the kernel only load-balances unicast across them).
+    if hasattr(socket, "SO_REUSEPORT"):
         sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
 
     # Bind to the multicast port
@@ -48,10 +123,15 @@ def create_receiver_socket(timeout: Optional[float] = None) -> socket.socket:
     return sock
 
 
-def create_sender_socket() -> socket.socket:
+def create_sender_socket(loop: bool = True) -> socket.socket:
     """
     Create a socket for sending multicast messages.
 
+    Args:
+        loop: Deliver sent packets to receivers on this host too. Needed
+            for agents sharing a machine; with only one agent per host,
+            False lets the kernel drop its own packets instead.
+
     Returns:
         Configured multicast sender socket
     """
@@ -60,8 +140,8 @@ def create_sender_socket() -> socket.socket:
     # Set TTL for multicast packets
     sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, MULTICAST_TTL)
 
-    # Enable loopback so sender can receive its own messages (useful for testing)
-    sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_LOOP, 1)
+    # Loopback lets other agents on this host (and the sender) receive it
+    sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_LOOP, int(loop))
 
     return sock
 
@@ -77,6 +157,49 @@ def send_multicast(sock: socket.socket, data: bytes) -> None:
     sock.sendto(data, (MULTICAST_GROUP, MULTICAST_PORT))
 
 
+def send_multicast_many(sock: socket.socket, payloads: List[bytes]) -> None:
+    """
+    Send several datagrams to the multicast group.
+
+    On Linux the datagrams are handed to the kernel with sendmmsg(), one
+    syscall per MAX_BATCH payloads; elsewhere this falls back to one
+    sendto() per payload.
+
+    Args:
+        sock: Sender socket created by create_sender_socket()
+        payloads: Bytes to send, one datagram each
+    """
+    if _sendmmsg is None:
+        for data in payloads:
+            send_multicast(sock, data)
+        return
+
+    for start in range(0, len(payloads), MAX_BATCH):
+        batch = payloads[start:start + MAX_BATCH]
+        count = len(batch)
+        iovecs = (_IOVec * count)()
+        msgs = (_MMsgHdr * count)()
+        for i, data in enumerate(batch):
+            # c_char_p points at the bytes object's own buffer (no copy);
+            # batch keeps the objects alive for the duration of the call
+            iovecs[i].iov_base = ctypes.cast(ctypes.c_char_p(data), ctypes.c_void_p)
+            iovecs[i].iov_len = len(data)
+            hdr = msgs[i].msg_hdr
+            hdr.msg_name = ctypes.addressof(_MULTICAST_ADDR)
+            hdr.msg_namelen = ctypes.sizeof(_MULTICAST_ADDR)
+            hdr.msg_iov = ctypes.pointer(iovecs[i])
+            hdr.msg_iovlen = 1
+
+        sent = 0
+        while sent < count:
+            offset = ctypes.addressof(msgs) + sent * ctypes.sizeof(_MMsgHdr)
+            result = _sendmmsg(sock.fileno(), offset, count - sent, 0)
+            if result < 0:
+                errno = ctypes.get_errno()
+                raise OSError(errno, os.strerror(errno))
+            sent += result
+
+
 def receive_multicast(sock: socket.socket) -> Tuple[bytes, Tuple[str, int]]:
     """
     Receive data from the multicast group.
@@ -92,3 +215,111 @@ def receive_multicast(sock: socket.socket) -> Tuple[bytes, Tuple[str, int]]:
     """
     data, addr = sock.recvfrom(BUFFER_SIZE)
     return data, addr
+
+
+class BatchReceiver:
+    """
+    Receives multicast datagrams in batches from a receiver socket.
+
+    On Linux, each receive() pulls every queued datagram (up to
+    max_packets) with a single recvmmsg() syscall. Elsewhere, or with
+    max_packets=1, it receives one datagram per call with recvfrom_into().
+
+    Datagrams are received into buffers allocated once and returned as
+    memoryviews of them, so nothing is allocated or copied per packet. The
+    views are only valid until the next receive() call.
+
+    Example:
+        receiver = BatchReceiver(create_receiver_socket(timeout=1.0))
+        for data, addr in receiver.receive():
+            ...
+    """
+
+    def __init__(self, sock: socket.socket, max_packets: int = 32):
+        """
+        Initialize the receiver.
+
+        Args:
+            sock: Receiver socket created by create_receiver_socket()
+            max_packets: Most datagrams returned per receive() call
+        """
+        self.sock = sock
+        self.max_packets = max_packets
+        self.batched = _recvmmsg is not None and max_packets > 1
+        if not self.batched:
+            self._buffer = bytearray(BUFFER_SIZE)
+            self._view = memoryview(self._buffer)
+            return
+
+        self._buffer = bytearray(BUFFER_SIZE * max_packets)
+        self._view = memoryview(self._buffer)
+        base = ctypes.addressof(ctypes.c_char.from_buffer(self._buffer))
+        self._addrs = (_SockAddrIn * max_packets)()
+        self._iovecs = (_IOVec * max_packets)()
+        self._msgs = (_MMsgHdr * max_packets)()
+        for i in range(max_packets):
+            self._iovecs[i].iov_base = base + i * BUFFER_SIZE
+            self._iovecs[i].iov_len = BUFFER_SIZE
+            hdr = self._msgs[i].msg_hdr
+            hdr.msg_name = ctypes.addressof(self._addrs[i])
+            hdr.msg_iov = ctypes.pointer(self._iovecs[i])
+            hdr.msg_iovlen = 1
+
+        self._poller = select.poll()
+        self._poller.register(sock, select.POLLIN)
+
+    def receive(self) -> List[Tuple[memoryview, Tuple[str, int]]]:
+        """
+        Receive one or more datagrams.
+
+        Blocks until at least one datagram arrives (or the socket timeout
+        expires), then returns everything already queued, in order. On a
+        non-blocking socket (timeout 0), returns an empty list when nothing
+        is queued.
+
+        Returns:
+            List of (data, (sender_ip, sender_port)) tuples, where data is
+            valid until the next call
+
+        Raises:
+            socket.timeout: If socket has timeout set and no data received
+        """
+        timeout = self.sock.gettimeout()
+
+        if not self.batched:
+            try:
+                nbytes, addr = self.sock.recvfrom_into(self._buffer)
+            except BlockingIOError:
+                return []
+            return [(self._view[:nbytes], addr)]
+
+        if timeout != 0.0:
+            if not self._poller.poll(None if timeout is None else timeout * 1000):
+                raise socket.timeout("timed out")
+
+        for i in range(self.max_packets):
+            self._msgs[i].msg_hdr.msg_namelen = ctypes.sizeof(_SockAddrIn)
+        count = _recvmmsg(
+            self.sock.fileno(),
+            ctypes.addressof(self._msgs),
+            self.max_packets,
+            socket.MSG_DONTWAIT,
+            None,
+        )
+        if count < 0:
+            errno = ctypes.get_errno()
+            if errno in (EAGAIN, EWOULDBLOCK):
+                return []
+            raise OSError(errno, os.strerror(errno))
+
+        packets = []
+        for i in range(count):
+            start = i * BUFFER_SIZE
+            data = self._view[start:start + self._msgs[i].msg_len]
+            addr = self._addrs[i]
+            sender = (
+                socket.inet_ntoa(bytes(addr.sin_addr)),
+                socket.ntohs(addr.sin_port),
+            )
+            packets.append((data, sender))
+        return packets
@@ -1,78 +1,327 @@
 """Message protocol for agent communication."""
 
-import json
+import os
+import struct
+import threading
 import time
-import uuid as uuid_module
-from dataclasses import dataclass, asdict
-from enum import Enum
-from typing import Optional
+from enum import IntEnum
+from typing import Callable, ClassVar, List, Optional, Tuple, Union
 
+import msgpack  # type: ignore[import-untyped]
 
-class MessageType(Enum):
-    """Types of messages in the protocol."""
-    MESSAGE = "message"
-    HEARTBEAT = "heartbeat"
+try:
+    import msgspec
+except ImportError:  # pragma: no cover - optional dependency
+    msgspec = None  # type: ignore[assignment]
+
+# Wire format version; bump whenever the encoded layout changes
+PROTOCOL_VERSION = 1
+
+_ARRAY_HEADER = b"\x95"  # msgpack fixarray holding the 5 message fields
+_TIMESTAMP = struct.Struct(">Bd")  # msgpack float64 marker + value
+_FLOAT64 = 0xCB
+
+# generate_uuid() draws from a per-thread pool of random bytes
+_ENTROPY_SIZE = 2048
+# Hex digit -> same digit with the RFC 4122 variant bits (10xx) set
+_VARIANT = {c: "89ab"[int(c, 16) & 3] for c in "0123456789abcdef"}
+_entropy = threading.local()
+
+# Per-thread msgpack Packer; reusing one skips allocating a Packer and
+# its buffer in every msgpack.packb() call
+_packers = threading.local()
+
+# With msgspec installed, encode with its (thread-safe) encoder and decode
+# well-formed messages with a decoder typed for the wire array
+if msgspec is not None:
+    _encoder: Optional["msgspec.msgpack.Encoder"] = msgspec.msgpack.Encoder()
+    _fields_decoder: Optional["msgspec.msgpack.Decoder"] = msgspec.msgpack.Decoder(
+        Tuple[int, str, int, str, float]
+    )
+else:  # pragma: no cover - optional dependency
+    _encoder = None
+    _fields_decoder = None
+
+
+class MessageType(IntEnum):
+    """Types of messages in the protocol (sent as ints on the wire)."""
+    MESSAGE = 1
+    HEARTBEAT = 2
+
+
+# Names used for types in Message.to_dict()/from_dict()
+_TYPE_NAMES = {t: t.name.lower() for t in MessageType}
+_TYPES_BY_NAME = {name: t for t, name in _TYPE_NAMES.items()}
+
+# Wire codes to members; a dict hit is much cheaper than MessageType(code)
+_TYPES_BY_CODE = {int(t): t for t in MessageType}
+
+# Clock for message timestamps; see set_time_source()
+_time_source: Callable[[], float] = time.time
+
+# Module globals avoid an enum attribute lookup per created message
+_MESSAGE = MessageType.MESSAGE
+_HEARTBEAT = MessageType.HEARTBEAT
 
 
-@dataclass
 class Message:
     """A message in the agent messenger protocol."""
-    uuid: str
-    type: MessageType
-    payload: str
-    timestamp: float
+
+    # One is allocated per packet, so skip the per-instance __dict__
+    # (dataclass(slots=True) needs Python 3.10)
+    __slots__ = ("uuid", "type", "payload", "timestamp")
+    # Positional patterns, e.g. ``case Message(uuid, MessageType.MESSAGE, text)``
+    __match_args__: ClassVar = ("uuid", "type", "payload", "timestamp")
+
+    def __init__(self, uuid: str, type: MessageType, payload: str, timestamp: float) -> None:
+        self.uuid = uuid
+        self.type = type
+        self.payload = payload
+        self.timestamp = timestamp
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Message):
+            return NotImplemented
+        return (
+            self.uuid == other.uuid
+            and self.type == other.type
+            and self.payload == other.payload
+            and self.timestamp == other.timestamp
+        )
+
+    # Mutable and compared by value, like the dataclass it replaces
+    __hash__ = None  # type: ignore[assignment]
+
+    def __repr__(self) -> str:
+        return (
+            f"Message(uuid={self.uuid!r}, type={self.type!r}, "
+            f"payload={self.payload!r}, timestamp={self.timestamp!r})"
+        )
 
     def to_dict(self) -> dict:
         """Convert message to dictionary for serialization."""
         return {
             "uuid": self.uuid,
-            "type": self.type.value,
+            "type": _TYPE_NAMES[self.type],
             "payload": self.payload,
             "timestamp": self.timestamp,
         }
 
     @classmethod
     def from_dict(cls, data: dict) -> "Message":
-        """Create message from dictionary."""
-        return cls(
-            uuid=data["uuid"],
-            type=MessageType(data["type"]),
-            payload=data["payload"],
-            timestamp=data["timestamp"],
-        )
+        """
+        Create message from dictionary.
+
+        Raises:
+            ValueError: If the type name is not a known message type
+        """
+        name = data["type"]
+        try:
+            message_type = _TYPES_BY_NAME[name]
+        except (KeyError, TypeError):
+            raise ValueError(f"Unknown message type: {name!r}") from None
+        return cls(data["uuid"], message_type, data["payload"], data["timestamp"])
+
+
+def _pack(obj: object) -> bytes:
+    if _encoder is not None:
+        return _encoder.encode(obj)
+    try:
+        packer = _packers.packer
+    except AttributeError:
+        packer = _packers.packer = msgpack.Packer()
+    return packer.pack(obj)
 
 
 def encode(message: Message) -> bytes:
-    """Encode a message to bytes for transmission."""
-    return json.dumps(message.to_dict()).encode("utf-8")
+    """
+    Encode a message to bytes for transmission.
+
+    Messages are sent as a MessagePack array
+    ``[version, uuid, type, payload, timestamp]``, so no field names go
+    over the wire.
+    """
+    return _pack([
+        PROTOCOL_VERSION,
+        message.uuid,
+        int(message.type),
+        message.payload,
+        message.timestamp,
+    ])
+
+
+def decode(data: Union[bytes, memoryview]) -> Message:
+    """
+    Decode bytes (or any buffer, such as a memoryview) into a message.
+
+    Raises:
+        ValueError: If the data is not a message in this protocol version
+    """
+    if _fields_decoder is not None:
+        # Anything the typed decoder rejects takes the generic path below,
+        # which reports errors (and accepts values) exactly as without msgspec
+        try:
+            version, uuid, type_, payload, timestamp = _fields_decoder.decode(data)
+        except msgspec.DecodeError:
+            pass
+        else:
+            if version == PROTOCOL_VERSION:
+                return Message(uuid, _message_type(type_), payload, timestamp)
+    try:
+        fields = msgpack.unpackb(data)
+    except ValueError as e:
+        raise ValueError(f"Malformed message: {e}") from None
+    if not isinstance(fields, list) or not fields or fields[0] != PROTOCOL_VERSION:
+        raise ValueError("Unsupported protocol version")
+    try:
+        _, uuid, type_, payload, timestamp = fields
+    except ValueError:
+        raise ValueError("Malformed message: wrong number of fields") from None
+    return Message(uuid, _message_type(type_), payload, timestamp)
+
+
+def encode_many(messages: List[Message]) -> bytes:
+    """
+    Encode several messages into one blob with a single msgpack call.
 
+    The blob is ``[version, [[uuid, type, payload, timestamp], ...]]`` and
+    is read back with decode_many(); it is not a valid input for decode().
+    """
+    return _pack([
+        PROTOCOL_VERSION,
+        [[m.uuid, int(m.type), m.payload, m.timestamp] for m in messages],
+    ])
 
-def decode(data: bytes) -> Message:
-    """Decode bytes into a message."""
-    parsed = json.loads(data.decode("utf-8"))
-    return Message.from_dict(parsed)
+
+def decode_many(data: Union[bytes, memoryview]) -> List[Message]:
+    """
+    Decode a blob produced by encode_many().
+
+    Raises:
+        ValueError: If the data is not a batch in this protocol version
+    """
+    try:
+        fields = msgpack.unpackb(data)
+    except ValueError as e:
+        raise ValueError(f"Malformed batch: {e}") from None
+    if not isinstance(fields, list) or not fields or fields[0] != PROTOCOL_VERSION:
+        raise ValueError("Unsupported protocol version")
+    try:
+        _, rows = fields
+        return [
+            Message(uuid, _message_type(type_), payload, timestamp)
+            for uuid, type_, payload, timestamp in rows
+        ]
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Malformed batch: {e}") from None
+
+
+def _message_type(code: object) -> MessageType:
+    try:
+        return _TYPES_BY_CODE[code]  # type: ignore[index]
+    except (KeyError, TypeError):
+        raise ValueError(f"Unknown message type: {code!r}") from None
+
+
+def encode_header(agent_uuid: str, message_type: Optional[MessageType] = None) -> bytes:
+    """
+    Encode the leading bytes shared by every message from an agent.
+
+    Packets starting with these bytes were sent by agent_uuid, which lets
+    receivers recognise them without decoding. With message_type the header
+    also covers the type field, so ``encode_header(uuid, type) +
+    encode_payload(payload) + encode_timestamp(ts)`` equals ``encode()``.
+    """
+    header = _ARRAY_HEADER + msgpack.packb(PROTOCOL_VERSION) + msgpack.packb(agent_uuid)
+    if message_type is not None:
+        header += msgpack.packb(int(message_type))
+    return header
+
+
+def encode_payload(payload: str) -> bytes:
+    """Encode the payload field that follows a typed header."""
+    return _pack(payload)
+
+
+def encode_prefix(agent_uuid: str, message_type: MessageType, payload: str) -> bytes:
+    """
+    Encode every field of a message except its trailing timestamp.
+
+    ``encode_prefix(...) + encode_timestamp(ts)`` produces the same bytes as
+    ``encode()``, so messages that only differ by time (heartbeats) can be
+    re-sent without re-encoding the other fields.
+    """
+    return encode_header(agent_uuid, message_type) + encode_payload(payload)
+
+
+def encode_timestamp(timestamp: float) -> bytes:
+    """Encode the timestamp that completes a prefix from encode_prefix()."""
+    return _TIMESTAMP.pack(_FLOAT64, timestamp)
+
+
+def make_encoder(agent_uuid: str, message_type: MessageType) -> Callable[[str, float], bytes]:
+    """
+    Build an encoder specialised for one sender and message type.
+
+    The returned ``encoder(payload, timestamp)`` produces the same bytes as
+    ``encode()``, with the uuid and type fields encoded once up front.
+    """
+    header = encode_header(agent_uuid, message_type)
+    pack_timestamp = _TIMESTAMP.pack
+
+    def encoder(payload: str, timestamp: float) -> bytes:
+        return header + _pack(payload) + pack_timestamp(_FLOAT64, timestamp)
+
+    return encoder
+
+
+def set_time_source(source: Optional[Callable[[], float]] = None) -> None:
+    """
+    Set the clock used for message timestamps and peer last-seen times.
+
+    This covers create_message(), create_heartbeat() and everything
+    AgentMessenger and FileTransport stamp or compare against message
+    timestamps. source must return wall-clock seconds like time.time(); a
+    caller that sends in bursts can install one that is sampled once per
+    loop tick. Pass None to go back to time.time().
+    """
+    global _time_source
+    _time_source = time.time if source is None else source
+
+
+def current_time() -> float:
+    """Current time in seconds from the clock installed by set_time_source()."""
+    return _time_source()
 
 
 def create_message(agent_uuid: str, text: str) -> Message:
     """Create a new text message."""
-    return Message(
-        uuid=agent_uuid,
-        type=MessageType.MESSAGE,
-        payload=text,
-        timestamp=time.time(),
-    )
+    return Message(agent_uuid, _MESSAGE, text, current_time())
 
 
 def create_heartbeat(agent_uuid: str) -> Message:
     """Create a heartbeat message for peer discovery."""
-    return Message(
-        uuid=agent_uuid,
-        type=MessageType.HEARTBEAT,
-        payload="",
-        timestamp=time.time(),
-    )
+    return Message(agent_uuid, _HEARTBEAT, "", current_time())
 
 
 def generate_uuid() -> str:
     """Generate a new UUID for an agent."""
-    return str(uuid_module.uuid4())
+    state = _entropy
+    offset = getattr(state, "offset", _ENTROPY_SIZE)
+    if offset + 16 > _ENTROPY_SIZE:
+        state.pool = os.urandom(_ENTROPY_SIZE)
+        offset = 0
+    state.offset = offset + 16
+    h = state.pool[offset:offset + 16].hex()
+    # Version 4 nibble, RFC 4122 variant
+    return f"{h[:8]}-{h[8:12]}-4{h[13:16]}-{_VARIANT[h[16]]}{h[17:20]}-{h[20:]}"
+
+
+def _reset_entropy() -> None:
+    # A forked child must not hand out the same UUIDs as its parent
+    global _entropy
+    _entropy = threading.local()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_entropy)
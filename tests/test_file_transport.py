@@ -0,0 +1,216 @@
+"""Tests for the file transport module."""
+
+import time
+
+import pytest
+
+from agent_messenger import file_transport
+from agent_messenger.file_transport import FileTransport
+from agent_messenger.protocol import encode, create_message, create_heartbeat
+
+
+def test_file_transport_delivers_messages(tmp_path):
+    """Messages written by one transport reach another."""
+    received = []
+
+    sender = FileTransport(str(tmp_path), "sender-uuid")
+    receiver = FileTransport(str(tmp_path), "receiver-uuid")
+    receiver.add_handler(received.append)
+
+    with sender, receiver:
+        time.sleep(0.2)
+        sender.send(create_message("sender-uuid", "Hello via files"))
+        time.sleep(1.0)
+
+    assert [m.payload for m in received] == ["Hello via files"]
+
+
+def test_file_transport_reads_existing_messages(tmp_path):
+    """Messages written before start() are delivered."""
+    received = []
+
+    sender = FileTransport(str(tmp_path), "sender-uuid")
+    sender.send(create_message("sender-uuid", "Early message"))
+
+    receiver = FileTransport(str(tmp_path), "receiver-uuid")
+    receiver.add_handler(received.append)
+
+    with receiver:
+        time.sleep(0.2)
+
+    assert [m.payload for m in received] == ["Early message"]
+
+
+def test_file_transport_skips_own_messages(tmp_path):
+    """A transport does not deliver its own messages."""
+    received = []
+
+    transport = FileTransport(str(tmp_path), "self-uuid")
+    transport.add_handler(received.append)
+
+    with transport:
+        transport.send(create_message("self-uuid", "Talking to myself"))
+        time.sleep(1.0)
+
+    assert received == []
+
+
+def test_file_transport_peers(tmp_path):
+    """Heartbeat files make agents visible as peers, excluding self."""
+    a = FileTransport(str(tmp_path), "agent-a")
+    b = FileTransport(str(tmp_path), "agent-b")
+
+    a.send_heartbeat(create_heartbeat("agent-a"))
+    b.send_heartbeat(create_heartbeat("agent-b"))
+
+    assert list(a.get_peers()) == ["agent-b"]
+    assert list(b.get_peers()) == ["agent-a"]
+
+
+def test_file_transport_large_message(tmp_path):
+    """Messages larger than a single read are delivered intact."""
+    received = []
+    text = "x" * 200_000
+
+    sender = FileTransport(str(tmp_path), "sender-uuid")
+    sender.send(create_message("sender-uuid", text))
+
+    receiver = FileTransport(str(tmp_path), "receiver-uuid")
+    receiver.add_handler(received.append)
+
+    with receiver:
+        time.sleep(0.2)
+
+    assert [m.payload for m in received] == [text]
+
+
+def test_file_transport_reads_only_new_log_entries(tmp_path):
+    """Each message in a log is delivered once, including partial writes."""
+    received = []
+
+    sender = FileTransport(str(tmp_path), "sender-uuid")
+    receiver = FileTransport(str(tmp_path), "receiver-uuid")
+    receiver.add_handler(received.append)
+
+    sender.send(create_message("sender-uuid", "first"))
+    receiver._poll_messages()
+
+    # Simulate a frame that is still being written
+    data = encode(create_message("sender-uuid", "second"))
+    frame = file_transport._FRAME_HEADER.pack(len(data)) + data
+    with open(sender._log_path, "ab") as f:
+        f.write(frame[:10])
+    receiver._poll_messages()
+    assert [m.payload for m in received] == ["first"]
+
+    with open(sender._log_path, "ab") as f:
+        f.write(frame[10:])
+    receiver._poll_messages()
+    receiver._poll_messages()
+    assert [m.payload for m in received] == ["first", "second"]
+
+
+def test_file_transport_log_rotation(tmp_path, monkeypatch):
+    """Rotation starts a new log and old generations are removed."""
+    received = []
+
+    sender = FileTransport(str(tmp_path), "sender-uuid")
+    receiver = FileTransport(str(tmp_path), "receiver-uuid")
+    receiver.add_handler(received.append)
+
+    sender.send(create_message("sender-uuid", "before rotation"))
+    first_log = sender._log_path
+    sender._cleanup_old_messages()
+    time.sleep(0.01)
+    sender.send(create_message("sender-uuid", "after rotation"))
+
+    assert sender._log_path != first_log
+    receiver._poll_messages()
+    assert [m.payload for m in received] == ["before rotation", "after rotation"]
+
+    monkeypatch.setattr(file_transport, "MESSAGE_TTL", -1.0)
+    sender._cleanup_old_messages()
+    assert not first_log.exists()
+
+    receiver._poll_messages()
+    assert first_log.name not in receiver._offsets
+
+
+def test_file_transport_peers_track_new_heartbeats(tmp_path):
+    """get_peers() picks up rewritten heartbeat files."""
+    a = FileTransport(str(tmp_path), "agent-a")
+    b = FileTransport(str(tmp_path), "agent-b")
+
+    first = create_heartbeat("agent-b")
+    b.send_heartbeat(first)
+    assert a.get_peers() == {"agent-b": first.timestamp}
+    assert a.get_peers() == {"agent-b": first.timestamp}
+
+    time.sleep(0.01)
+    second = create_heartbeat("agent-b")
+    b.send_heartbeat(second)
+    assert a.get_peers() == {"agent-b": second.timestamp}
+
+
+def test_file_transport_orders_messages_per_sender(tmp_path):
+    """Messages from each sender arrive in order, across senders in parallel."""
+    received = []
+
+    senders = [FileTransport(str(tmp_path), f"sender-{i}") for i in range(3)]
+    receiver = FileTransport(str(tmp_path), "receiver-uuid")
+    receiver.add_handler(received.append)
+
+    with receiver:
+        time.sleep(0.2)
+        for n in range(20):
+            for sender in senders:
+                sender.send(create_message(sender.uuid, str(n)))
+        time.sleep(1.0)
+
+    for sender in senders:
+        texts = [m.payload for m in received if m.uuid == sender.uuid]
+        assert texts == [str(n) for n in range(20)]
+
+
+@pytest.mark.skipif(file_transport.watchfiles is None, reason="watchfiles not installed")
+def test_file_transport_rescans_despite_local_activity(tmp_path, monkeypatch):
+    """Missed notifications are caught by rescans even while we keep sending."""
+    received = []
+
+    sender = FileTransport(str(tmp_path), "sender-uuid")
+    receiver = FileTransport(str(tmp_path), "receiver-uuid")
+    receiver.add_handler(received.append)
+    # Simulate a shared volume that never reports the sender's writes
+    monkeypatch.setattr(receiver, "_watch_filter", lambda change, path: False)
+
+    with receiver:
+        time.sleep(0.2)
+        sender.send(create_message("sender-uuid", "Unnoticed"))
+        deadline = time.time() + 3.0
+        while not received and time.time() < deadline:
+            receiver.send(create_message("receiver-uuid", "Busy"))
+            time.sleep(0.1)
+
+    assert [m.payload for m in received] == ["Unnoticed"]
+
+
+@pytest.mark.skipif(file_transport.watchfiles is None, reason="watchfiles not installed")
+def test_file_transport_falls_back_to_polling(tmp_path, monkeypatch):
+    """If watching fails, the transport keeps receiving by polling."""
+    def broken_watch(*args, **kwargs):
+        raise OSError("inotify watch limit reached")
+        yield  # pragma: no cover
+
+    monkeypatch.setattr(file_transport.watchfiles, "watch", broken_watch)
+    received = []
+
+    sender = FileTransport(str(tmp_path), "sender-uuid")
+    receiver = FileTransport(str(tmp_path), "receiver-uuid")
+    receiver.add_handler(received.append)
+
+    with receiver:
+        time.sleep(0.2)
+        sender.send(create_message("sender-uuid", "Polled"))
+        time.sleep(1.0)
+
+    assert [m.payload for m in received] == ["Polled"]
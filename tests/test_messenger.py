@@ -4,7 +4,10 @@ import time
 import threading
 import pytest
 
-from agent_messenger.messenger import AgentMessenger
+from agent_messenger.file_transport import FileTransport
+from agent_messenger.messenger import AgentMessenger, PEER_TIMEOUT
+from agent_messenger.network import create_receiver_socket, receive_multicast
+from agent_messenger.protocol import create_heartbeat, decode, set_time_source
 
 
 def test_messenger_creates_uuid():
@@ -106,6 +109,32 @@ def test_messenger_communication():
     assert any(text == "Hello from m2" for uuid, text in received1)
 
 
+def test_messenger_send_many():
+    """send_many() delivers every message in order."""
+    received = []
+
+    m1 = AgentMessenger()
+    m2 = AgentMessenger()
+
+    @m2.on_message
+    def handler(uuid, text):
+        received.append(text)
+
+    m1.start()
+    m2.start()
+
+    time.sleep(0.2)  # Allow sockets to initialize
+
+    texts = [f"Message {i}" for i in range(20)]
+    m1.send_many(texts)
+    time.sleep(0.2)  # Allow messages to propagate
+
+    m1.stop()
+    m2.stop()
+
+    assert received == texts
+
+
 def test_messenger_peer_discovery():
     """Messengers discover each other as peers."""
     m1 = AgentMessenger()
@@ -170,3 +199,91 @@ def test_get_active_peer_count():
     m1.stop()
     m2.stop()
     m3.stop()
+
+
+def test_peer_last_seen_uses_receive_time():
+    """Peers are tracked by local receive time when it is known."""
+    m = AgentMessenger()
+    heartbeat = create_heartbeat("peer-uuid")
+
+    m._handle_message(heartbeat, heartbeat.timestamp + 3.0)
+    assert m._peers == {"peer-uuid": heartbeat.timestamp + 3.0}
+
+    m._handle_message(heartbeat)
+    assert m._peers == {"peer-uuid": heartbeat.timestamp}
+
+
+def test_peers_expire_and_return():
+    """Peers drop out after PEER_TIMEOUT and come back when heard from."""
+    m = AgentMessenger()
+    heartbeat = create_heartbeat("peer-uuid")
+    now = time.time()
+
+    m._handle_message(heartbeat, now - PEER_TIMEOUT - 1.0)
+    m._handle_message(create_heartbeat("other-uuid"), now)
+    assert list(m.get_peers()) == ["other-uuid"]
+
+    m._handle_message(heartbeat, now)
+    assert m.get_peers() == {"peer-uuid": now, "other-uuid": now}
+
+
+def test_expired_peers_are_forgotten():
+    """Expired peers are dropped from tracking rather than kept forever."""
+    m = AgentMessenger()
+    now = time.time()
+
+    m._handle_message(create_heartbeat("peer-uuid"), now - PEER_TIMEOUT - 1.0)
+    assert m.get_active_peer_count() == 0
+    assert m._peers == {}
+
+
+def test_peer_heard_during_expiry_stays_active():
+    """A packet arriving while its sender is being expired keeps it active."""
+    m = AgentMessenger()
+    now = time.time()
+    m._handle_message(create_heartbeat("peer-uuid"), now - PEER_TIMEOUT - 1.0)
+
+    class RacingSet(set):
+        def discard(self, uuid):
+            # The receive path sees the peer still active and so does
+            # not queue it for reactivation
+            m._peers[uuid] = now
+            super().discard(uuid)
+
+    with m._expiry_lock:
+        m._expire_peers(now - PEER_TIMEOUT)  # activate it, not yet expired
+    m._active_peers = RacingSet(m._active_peers)
+
+    assert m.get_peers() == {"peer-uuid": now}
+    assert m.get_peers() == {"peer-uuid": now}
+
+
+def test_messenger_uses_installed_time_source(tmp_path):
+    """Sent messages and both heartbeat kinds use set_time_source()."""
+    receiver = create_receiver_socket(timeout=0.1)
+    reader = FileTransport(str(tmp_path), "reader-uuid")
+    received = []
+    reader.add_handler(received.append)
+
+    set_time_source(lambda: 1234.5)
+    try:
+        with AgentMessenger(file_dir=str(tmp_path)) as m:
+            m.send("hello")
+            stamps = set()
+            deadline = time.time() + 2.0
+            while len(stamps) < 2 and time.time() < deadline:
+                try:
+                    message = decode(receive_multicast(receiver)[0])
+                except Exception:
+                    continue
+                if message.uuid == m.uuid:
+                    stamps.add((message.type, message.timestamp))
+            reader._poll_messages()
+            assert reader.get_peers() == {m.uuid: 1234.5}
+    finally:
+        set_time_source(None)
+        receiver.close()
+
+    assert {timestamp for _, timestamp in stamps} == {1234.5}
+    assert len(stamps) == 2
+    assert [msg.timestamp for msg in received] == [1234.5]
@@ -0,0 +1,151 @@
+"""Tests for the network module."""
+
+import socket
+import pytest
+
+from agent_messenger import network
+
+from agent_messenger.network import (
+    create_receiver_socket,
+    create_sender_socket,
+    send_multicast,
+    send_multicast_many,
+    receive_multicast,
+    BatchReceiver,
+)
+
+
+def _receive_all(sock):
+    """Drain every datagram currently queued on sock."""
+    received = []
+    try:
+        while True:
+            data, _ = receive_multicast(sock)
+            received.append(data)
+    except socket.timeout:
+        pass
+    return received
+
+
+def test_send_receive_multicast():
+    """A datagram sent to the group is received."""
+    receiver = create_receiver_socket(timeout=0.5)
+    sender = create_sender_socket()
+    try:
+        send_multicast(sender, b"hello")
+        assert _receive_all(receiver) == [b"hello"]
+    finally:
+        receiver.close()
+        sender.close()
+
+
+@pytest.mark.skipif(not hasattr(socket, "SO_REUSEPORT"), reason="no SO_REUSEPORT")
+def test_receiver_sockets_share_port():
+    """Receiver sockets set SO_REUSEPORT and each gets every datagram."""
+    receivers = [create_receiver_socket(timeout=0.5) for _ in range(2)]
+    sender = create_sender_socket()
+    try:
+        for receiver in receivers:
+            assert receiver.getsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT)
+        send_multicast(sender, b"hello")
+        assert [_receive_all(r) for r in receivers] == [[b"hello"], [b"hello"]]
+    finally:
+        for receiver in receivers:
+            receiver.close()
+        sender.close()
+
+
+def test_sender_socket_loopback():
+    """create_sender_socket() sets multicast loopback as requested."""
+    for loop in (True, False):
+        sender = create_sender_socket(loop=loop)
+        try:
+            value = sender.getsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_LOOP)
+            assert value == int(loop)
+        finally:
+            sender.close()
+
+
+def test_send_multicast_many():
+    """send_multicast_many() sends every payload as its own datagram."""
+    payloads = [f"packet {i}".encode() for i in range(50)]
+
+    receiver = create_receiver_socket(timeout=0.5)
+    sender = create_sender_socket()
+    try:
+        send_multicast_many(sender, payloads)
+        assert _receive_all(receiver) == payloads
+    finally:
+        receiver.close()
+        sender.close()
+
+
+def test_send_multicast_many_fallback(monkeypatch):
+    """send_multicast_many() works without sendmmsg()."""
+    monkeypatch.setattr(network, "_sendmmsg", None)
+    payloads = [f"packet {i}".encode() for i in range(5)]
+
+    receiver = create_receiver_socket(timeout=0.5)
+    sender = create_sender_socket()
+    try:
+        send_multicast_many(sender, payloads)
+        assert _receive_all(receiver) == payloads
+    finally:
+        receiver.close()
+        sender.close()
+
+
+def test_batch_receiver():
+    """BatchReceiver returns queued datagrams in order, in batches."""
+    payloads = [f"packet {i}".encode() for i in range(40)]
+
+    receiver = create_receiver_socket(timeout=0.5)
+    sender = create_sender_socket()
+    try:
+        send_multicast_many(sender, payloads)
+        batch_receiver = BatchReceiver(receiver, max_packets=32)
+
+        # Views are only valid until the next receive(), so copy them
+        first = [bytes(data) for data, _ in batch_receiver.receive()]
+        second = [bytes(data) for data, _ in batch_receiver.receive()]
+
+        assert len(first) <= 32
+        assert first + second == payloads
+    finally:
+        receiver.close()
+        sender.close()
+
+
+def test_batch_receiver_single_packet():
+    """BatchReceiver with max_packets=1 receives one datagram per call."""
+    receiver = create_receiver_socket(timeout=0.5)
+    sender = create_sender_socket()
+    try:
+        send_multicast_many(sender, [b"one", b"two"])
+        batch_receiver = BatchReceiver(receiver, max_packets=1)
+
+        assert [data for data, _ in batch_receiver.receive()] == [b"one"]
+        assert [data for data, _ in batch_receiver.receive()] == [b"two"]
+    finally:
+        receiver.close()
+        sender.close()
+
+
+def test_batch_receiver_timeout():
+    """BatchReceiver raises socket.timeout when nothing arrives."""
+    receiver = create_receiver_socket(timeout=0.1)
+    try:
+        with pytest.raises(socket.timeout):
+            BatchReceiver(receiver).receive()
+    finally:
+        receiver.close()
+
+
+def test_batch_receiver_non_blocking():
+    """BatchReceiver on a non-blocking socket returns [] when idle."""
+    receiver = create_receiver_socket(timeout=0.0)
+    try:
+        assert BatchReceiver(receiver).receive() == []
+        assert BatchReceiver(receiver, max_packets=1).receive() == []
+    finally:
+        receiver.close()
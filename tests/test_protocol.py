@@ -1,16 +1,30 @@
 """Tests for the protocol module."""
 
+import os
 import time
+import uuid as uuid_module
+import msgpack
 import pytest
 
+from agent_messenger import protocol
 from agent_messenger.protocol import (
     Message,
     MessageType,
     encode,
     decode,
+    encode_many,
+    decode_many,
+    encode_header,
+    encode_payload,
+    encode_prefix,
+    encode_timestamp,
+    make_encoder,
     create_message,
     create_heartbeat,
+    set_time_source,
+    current_time,
     generate_uuid,
+    PROTOCOL_VERSION,
 )
 
 
@@ -31,6 +45,34 @@ def test_generate_uuid():
     assert uuid1.count("-") == 4
 
 
+def test_generate_uuid_is_version_4():
+    """Generated UUIDs are canonical random (version 4, RFC 4122) UUIDs."""
+    for _ in range(300):  # spans more than one buffered entropy pool
+        value = generate_uuid()
+        parsed = uuid_module.UUID(value)
+
+        assert str(parsed) == value
+        assert parsed.version == 4
+        assert parsed.variant == uuid_module.RFC_4122
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="no fork")
+def test_generate_uuid_after_fork():
+    """A forked child does not reuse its parent's UUIDs."""
+    generate_uuid()  # make sure the parent has buffered entropy
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.write(write_fd, generate_uuid().encode())
+        os._exit(0)
+    os.close(write_fd)
+    os.waitpid(pid, 0)
+    child_uuid = os.read(read_fd, 64).decode()
+    os.close(read_fd)
+
+    assert child_uuid != generate_uuid()
+
+
 def test_create_message():
     """create_message produces valid Message objects."""
     uuid = "test-uuid-1234"
@@ -82,6 +124,20 @@ def test_encode_decode_heartbeat():
     assert decoded.payload == ""
 
 
+def test_set_time_source():
+    """Factories timestamp messages with the installed time source."""
+    set_time_source(lambda: 1234.5)
+    try:
+        assert create_message("uuid", "text").timestamp == 1234.5
+        assert create_heartbeat("uuid").timestamp == 1234.5
+        assert current_time() == 1234.5
+    finally:
+        set_time_source(None)
+
+    before = time.time()
+    assert create_message("uuid", "text").timestamp >= before
+
+
 def test_encode_produces_bytes():
     """encode() returns bytes."""
     msg = create_message("uuid", "text")
@@ -99,6 +155,24 @@ def test_decode_handles_utf8():
     assert decoded.payload == "Hello 你好 مرحبا 🎉"
 
 
+def test_message_from_dict_rejects_unknown_type():
+    """Message.from_dict() raises ValueError for unknown type names."""
+    d = {"uuid": "test-uuid", "type": "bogus", "payload": "", "timestamp": 1.0}
+
+    with pytest.raises(ValueError, match="bogus"):
+        Message.from_dict(d)
+
+
+def test_message_equality():
+    """Messages compare by value and carry no per-instance __dict__."""
+    msg = Message("test-uuid", MessageType.MESSAGE, "Hello", 1.5)
+
+    assert msg == Message("test-uuid", MessageType.MESSAGE, "Hello", 1.5)
+    assert msg != Message("test-uuid", MessageType.MESSAGE, "Hello", 2.5)
+    assert not hasattr(msg, "__dict__")
+    assert Message.__match_args__ == ("uuid", "type", "payload", "timestamp")
+
+
 def test_message_to_dict():
     """Message.to_dict() produces correct dictionary."""
     msg = Message(
@@ -133,3 +207,144 @@ def test_message_from_dict():
     assert msg.type == MessageType.HEARTBEAT
     assert msg.payload == ""
     assert msg.timestamp == 1234567890.123
+
+
+def test_encode_omits_field_names():
+    """encode() sends fields positionally, without their names."""
+    msg = create_message("uuid", "text")
+    encoded = encode(msg)
+
+    assert b"payload" not in encoded
+    assert b"timestamp" not in encoded
+
+
+def test_encode_matches_msgpack():
+    """encode() emits the same bytes whether or not msgspec is installed."""
+    msg = create_message("test-uuid", "Hello 你好")
+
+    assert encode(msg) == msgpack.packb(
+        [PROTOCOL_VERSION, msg.uuid, int(msg.type), msg.payload, msg.timestamp]
+    )
+
+
+def test_decode_accepts_loosely_typed_fields():
+    """decode() accepts fields outside the usual types, e.g. int timestamps."""
+    data = msgpack.packb([PROTOCOL_VERSION, "uuid", 1, "text", 5])
+
+    assert decode(data).timestamp == 5
+
+
+def test_decode_rejects_unknown_version():
+    """decode() rejects messages from another protocol version."""
+    data = msgpack.packb([PROTOCOL_VERSION + 1, "uuid", 1, "text", 1.0])
+
+    with pytest.raises(ValueError, match="version"):
+        decode(data)
+
+
+def test_decode_rejects_unknown_type():
+    """decode() raises ValueError for message types it does not know."""
+    for type_ in [0, 99, -1, "message", [1]]:
+        data = msgpack.packb([PROTOCOL_VERSION, "uuid", type_, "text", 1.0])
+        with pytest.raises(ValueError, match="type"):
+            decode(data)
+
+
+def test_decode_rejects_garbage():
+    """decode() raises ValueError for data that is not a message."""
+    with pytest.raises(ValueError):
+        decode(b'{"uuid": "test-uuid"}')
+
+
+def test_encode_recovers_from_unpackable_payload(monkeypatch):
+    """A failed encode() does not leave stray bytes in the next one."""
+    # Use the reused msgpack Packer even when msgspec is installed
+    monkeypatch.setattr(protocol, "_encoder", None)
+    msg = create_message("uuid", "text")
+    with pytest.raises(TypeError):
+        encode(Message("uuid", MessageType.MESSAGE, object(), 1.0))  # type: ignore[arg-type]
+
+    assert decode(encode(msg)) == msg
+
+
+def test_encode_decode_without_msgspec(monkeypatch):
+    """The msgpack-only path encodes and decodes like the msgspec one."""
+    msg = create_message("uuid", "Hello 你好")
+    data = encode(msg)
+    monkeypatch.setattr(protocol, "_encoder", None)
+    monkeypatch.setattr(protocol, "_fields_decoder", None)
+
+    assert encode(msg) == data
+    assert decode(data) == msg
+    assert decode(memoryview(data)) == msg
+    assert decode(msgpack.packb([PROTOCOL_VERSION, "uuid", 1, "text", 5])).timestamp == 5
+    with pytest.raises(ValueError, match="version"):
+        decode(msgpack.packb([PROTOCOL_VERSION + 1, "uuid", 1, "text", 1.0]))
+    with pytest.raises(ValueError, match="type"):
+        decode(msgpack.packb([PROTOCOL_VERSION, "uuid", 99, "text", 1.0]))
+    with pytest.raises(ValueError):
+        decode(b"garbage")
+
+
+def test_encode_decode_many():
+    """encode_many()/decode_many() round-trip a batch of messages."""
+    messages = [create_message("uuid", f"msg {i}") for i in range(10)]
+    messages.append(create_heartbeat("uuid"))
+
+    assert decode_many(encode_many(messages)) == messages
+    assert decode_many(encode_many([])) == []
+
+
+def test_decode_many_rejects_bad_batches():
+    """decode_many() raises ValueError for anything but a batch."""
+    for data in [
+        encode(create_message("uuid", "text")),
+        msgpack.packb([PROTOCOL_VERSION, [["uuid", 99, "text", 1.0]]]),
+        msgpack.packb([PROTOCOL_VERSION, [["uuid", 1]]]),
+        msgpack.packb([PROTOCOL_VERSION + 1, []]),
+        b"garbage",
+    ]:
+        with pytest.raises(ValueError):
+            decode_many(data)
+
+
+def test_encode_prefix_matches_encode():
+    """encode_prefix() + encode_timestamp() equals encode()."""
+    msg = create_heartbeat("test-uuid")
+
+    data = encode_prefix(msg.uuid, msg.type, msg.payload) + encode_timestamp(msg.timestamp)
+
+    assert data == encode(msg)
+    assert decode(data) == msg
+
+
+def test_encode_header_prefixes_messages():
+    """Every encoded message starts with its sender's header."""
+    header = encode_header("test-uuid")
+
+    assert encode(create_message("test-uuid", "text")).startswith(header)
+    assert encode(create_heartbeat("test-uuid")).startswith(header)
+    assert not encode(create_message("other-uuid", "text")).startswith(header)
+
+
+def test_typed_header_matches_encode():
+    """A typed header plus payload and timestamp equals encode()."""
+    msg = create_message("test-uuid", "héllo")
+
+    data = (
+        encode_header(msg.uuid, msg.type)
+        + encode_payload(msg.payload)
+        + encode_timestamp(msg.timestamp)
+    )
+
+    assert data == encode(msg)
+    assert decode(data) == msg
+
+
+def test_make_encoder_matches_encode():
+    """A specialised encoder produces the same bytes as encode()."""
+    encoder = make_encoder("test-uuid", MessageType.MESSAGE)
+
+    for text in ["", "hello", "x" * 1000]:
+        msg = create_message("test-uuid", text)
+        assert encoder(msg.payload, msg.timestamp) == encode(msg)